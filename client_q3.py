@@ -2,55 +2,123 @@ import socket
 import time
 import argparse
 
+# SO_MAX_PACING_RATE is not exported by the socket module; 47 is its value on Linux.
+SO_MAX_PACING_RATE = getattr(socket, 'SO_MAX_PACING_RATE', 47)
+
+# Requested send/receive buffer size. Linux caps this at net.core.wmem_max / rmem_max,
+# so very high bandwidth-delay links need those sysctls raised as well.
+SOCKET_BUFFER_SIZE = 4 * 1024 * 1024
+
+def enable_kernel_pacing(client_socket, rate):
+    """
+    Ask the kernel to pace the socket at `rate` bytes per second.
+    Requires the fq qdisc on the outgoing interface. Returns True on success.
+    """
+    try:
+        client_socket.setsockopt(socket.SOL_SOCKET, SO_MAX_PACING_RATE, rate)
+    except OSError as e:
+        print("Could not enable kernel pacing:", e)
+        return False
+    print(f"Kernel pacing enabled (SO_MAX_PACING_RATE = {rate} bytes/sec).")
+    return True
+
+def wait_until(deadline):
+    """
+    Wait until the given time.monotonic() deadline. time.sleep() jitter is comparable
+    to sub-millisecond intervals, so the last millisecond is spent busy-waiting.
+    """
+    delay = deadline - time.monotonic()
+    if delay > 0.001:
+        time.sleep(delay - 0.001)
+    while time.monotonic() < deadline:
+        pass
+
+def set_quickack(client_socket):
+    """
+    Set TCP_QUICKACK on the socket. The kernel clears this flag again after
+    reads, so it has to be re-applied after every recv().
+    """
+    client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+
 def send_data_at_rate(server_ip='127.0.0.1', port=12345, total_bytes=4096, rate_bytes_per_second=40,
-                      disable_nagle=False, disable_delayed_ack=False):
+                      enable_nagle=False, disable_delayed_ack=False, kernel_pacing=False, cork=False):
     client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
-    # Disable Nagle's algorithm if requested
-    if disable_nagle:
+    # Size the buffers so the whole payload fits in the send queue and sendall() does not block
+    client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+    client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+    print("Socket buffers: SO_SNDBUF = {} bytes, SO_RCVBUF = {} bytes".format(
+        client_socket.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF),
+        client_socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)))
+
+    # Nagle's algorithm is disabled unless explicitly requested
+    if enable_nagle:
+        print("Nagle's algorithm is enabled.")
+    else:
         client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         print("Nagle's algorithm has been disabled (TCP_NODELAY set).")
 
+    # Disable delayed ACK if requested and supported
+    quickack = False
+    if disable_delayed_ack:
+        if hasattr(socket, 'TCP_QUICKACK'):
+            try:
+                set_quickack(client_socket)
+                quickack = True
+                print("Delayed ACK has been disabled (TCP_QUICKACK set).")
+            except Exception as e:
+                print("Could not disable delayed ACK:", e)
+        else:
+            print("Disabling delayed ACK is not supported on this system.")
+
     try:
         client_socket.connect((server_ip, port))
         print(f"Connected to server at {server_ip}:{port}")
 
-        # Disable delayed ACK if requested and supported    
-        if disable_delayed_ack:
-            if hasattr(socket, 'TCP_QUICKACK'):
-                try:
-                    client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
-                    print("Delayed ACK has been disabled (TCP_QUICKACK set).")
-                except Exception as e:
-                    print("Could not disable delayed ACK:", e)
-            else:
-                print("Disabling delayed ACK is not supported on this system.")
-
-        data = 'A' * total_bytes  # Prepare 4KB of data
-        bytes_sent = 0
+        # Prepare 4KB of data, encoded once; slices of a memoryview are not copied
+        payload = memoryview(b'A' * total_bytes)
 
         # Send data in chunks to match the specified rate
         chunk_size = rate_bytes_per_second  # number of bytes per interval
         interval = 0.0005  # seconds between chunks
 
-        while bytes_sent < total_bytes:
-            # Calculate how many bytes to send in this round
-            current_chunk_size = chunk_size
-            if bytes_sent + current_chunk_size > total_bytes:
-                current_chunk_size = total_bytes - bytes_sent  # send the remaining bytes
-
-            chunk = data[bytes_sent:bytes_sent + current_chunk_size]
-            client_socket.sendall(chunk.encode('utf-8'))
-            bytes_sent += len(chunk)
-
-            print(f"Sent {len(chunk)} bytes, Total sent: {bytes_sent}/{total_bytes} bytes")
-            time.sleep(interval)
-
-        print("Finished sending all data.")
+        if kernel_pacing and enable_kernel_pacing(client_socket, int(chunk_size / interval)):
+            # The kernel spaces the packets out, so hand it everything at once.
+            client_socket.sendall(payload)
+        else:
+            # With cork, every chunk but the last is sent with MSG_MORE so the kernel can
+            # coalesce the small writes; the last one goes out immediately.
+            more_flag = getattr(socket, 'MSG_MORE', 0) if cork else 0
+            bytes_sent = 0
+            # Each send is scheduled against an absolute deadline so sleep jitter does not accumulate
+            next_send = time.monotonic()
+            while bytes_sent < total_bytes:
+                # Calculate how many bytes to send in this round
+                current_chunk_size = chunk_size
+                if bytes_sent + current_chunk_size > total_bytes:
+                    current_chunk_size = total_bytes - bytes_sent  # send the remaining bytes
+
+                chunk = payload[bytes_sent:bytes_sent + current_chunk_size]
+                bytes_sent += current_chunk_size
+                client_socket.sendall(chunk, more_flag if bytes_sent < total_bytes else 0)
+                next_send += interval
+                wait_until(next_send)
+
+        print(f"Finished sending all data ({total_bytes} bytes).")
+
+        # Signal end of data so the server closes its side and recv() returns
+        client_socket.shutdown(socket.SHUT_WR)
 
         # Optionally, receive server response
-        response = client_socket.recv(1024).decode('utf-8')
-        print(f"Server response: {response}")
+        response = b''
+        while True:
+            chunk = client_socket.recv(1024)
+            if quickack:
+                set_quickack(client_socket)
+            if not chunk:
+                break
+            response += chunk
+        print(f"Server response: {response.decode('utf-8')}")
 
     except Exception as e:
         print(f"Error: {e}")
@@ -61,14 +129,19 @@ def send_data_at_rate(server_ip='127.0.0.1', port=12345, total_bytes=4096, rate_
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
-        description="Send data at a specified rate with options to disable Nagle's algorithm and delayed ACK."
+        description="Send data at a specified rate with options to enable Nagle's algorithm and disable delayed ACK."
     )
     parser.add_argument("--server-ip", type=str, default='0.0.0.0', help="Server IP address")
     parser.add_argument("--port", type=int, default=8080, help="Server port")
     parser.add_argument("--total-bytes", type=int, default=4096, help="Total bytes to send")
     parser.add_argument("--rate-bytes", type=int, default=40, help="Rate in bytes per second")
-    parser.add_argument("--disable-nagle", action="store_true", help="Disable Nagle's algorithm (TCP_NODELAY)")
+    parser.add_argument("--enable-nagle", action="store_true",
+                        help="Keep Nagle's algorithm on (TCP_NODELAY is set by default)")
     parser.add_argument("--disable-delayed-ack", action="store_true", help="Disable delayed ACK (if supported)")
+    parser.add_argument("--kernel-pacing", action="store_true",
+                        help="Let the kernel pace a single send (SO_MAX_PACING_RATE, needs fq qdisc)")
+    parser.add_argument("--cork", action="store_true",
+                        help="Send all but the last chunk with MSG_MORE so the kernel coalesces them")
 
     args = parser.parse_args()
 
@@ -77,8 +150,10 @@ if __name__ == '__main__':
         port=args.port,
         total_bytes=args.total_bytes,
         rate_bytes_per_second=args.rate_bytes,
-        disable_nagle=args.disable_nagle,
-        disable_delayed_ack=args.disable_delayed_ack
+        enable_nagle=args.enable_nagle,
+        disable_delayed_ack=args.disable_delayed_ack,
+        kernel_pacing=args.kernel_pacing,
+        cork=args.cork
     )
 
 nmcli con mod "Wired conncetion 1" ipv4.addresses 192.168.56.102/24
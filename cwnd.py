@@ -1,7 +1,14 @@
 import os
 import re
-import glob
-import matplotlib.pyplot as plt
+import mmap
+import numpy as np
+import matplotlib
+# Figures are drawn straight onto an Agg canvas, bypassing pyplot's global state
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+matplotlib.rcParams['path.simplify'] = True
+matplotlib.rcParams['agg.path.chunksize'] = 10000
 
 # Directory containing the log files
 log_dir = r'/home/dewansh/Documents/CN_Assignment/Assignement_2/logs_q1_B'
@@ -11,45 +18,53 @@ output_dir = r'/home/dewansh/Documents/CN_Assignment/Assignement_2/cs331-cwnd'
 # Create the output directory if it doesn't exist
 os.makedirs(output_dir, exist_ok=True)
 
-# Pattern to match log files excluding those with 'reno' in their names
-log_files_pattern = os.path.join(log_dir, '*[!reno]*.log')
+# Log files, excluding those with 'reno' in their names
+with os.scandir(log_dir) as it:
+    log_files = [e.path for e in it if e.is_file() and e.name.endswith('.log') and 'reno' not in e.name]
+
+# Interval line of an iperf3 log:
+# [ ID] start-end sec  transfer unit  bitrate unit  retr  cwnd unit
+LOG_RE = re.compile(rb'\[\s*\d+\]\s+(\d+(?:\.\d+)?)-(\d+(?:\.\d+)?)\s+sec\s+(\d+(?:\.\d+)?)\s+(KBytes|MBytes)\s+(\d+(?:\.\d+)?)\s+(?:bits|Kbits|Mbits)/sec\s+\d+\s+(\d+(?:\.\d+)?)\s+(KBytes|MBytes)')
 
 # Function to parse the log file and extract time and cwnd values
 def parse_log_file(file_path):
-    time_cwnd = []
-    with open(file_path, 'r') as file:
-        for line in file:
-            match = re.search(r'\[\s*\d+\]\s+(\d+\.\d+|\d+)-(\d+\.\d+|\d+)\s+sec\s+(\d+\.\d+|\d+)\s+(KBytes|MBytes)\s+(\d+\.\d+|\d+)\s+(bits/sec|Kbits/sec|Mbits/sec)\s+\d+\s+(\d+\.\d+|\d+)\s+(KBytes|MBytes)', line)
-            if match:
-                start_time = float(match.group(1))
-                end_time = float(match.group(2))
-                transfer_size = float(match.group(3))
-                transfer_unit = match.group(4)
-                cwnd = float(match.group(7))
-                cwnd_unit = match.group(8)
-                if transfer_unit == 'MBytes':
-                    transfer_size *= 1024  # Convert MBytes to KBytes
-                if cwnd_unit == 'MBytes':
-                    cwnd *= 1024  # Convert MBytes to KBytes
-                time_cwnd.append((end_time, cwnd))
-    return time_cwnd
+    """
+    Returns two numpy arrays: interval end times (seconds) and cwnd (KBytes).
+    The whole file is scanned in one pass with the compiled pattern over an mmap.
+    """
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            matches = []  # mmap cannot map an empty file
+        else:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                matches = LOG_RE.findall(mm)
+    if not matches:
+        return np.empty(0), np.empty(0)
+    fields = np.array(matches)
+    times = fields[:, 1].astype(float)
+    cwnds = fields[:, 5].astype(float)
+    cwnds[fields[:, 6] == b'MBytes'] *= 1024  # Convert MBytes to KBytes
+    return times, cwnds
+
+# One figure is reused for every log file
+fig = Figure(figsize=(10, 6), dpi=80)
+canvas = FigureCanvasAgg(fig)
+ax = fig.add_subplot(111)
 
 # Collect data from each matching log file and plot the graph
-for log_file in glob.glob(log_files_pattern):
-    time_cwnd = parse_log_file(log_file)
-    if time_cwnd:
+for log_file in log_files:
+    times, cwnds = parse_log_file(log_file)
+    if times.size:
         # Sort data by time
-        time_cwnd.sort()
-        # Separate time and cwnd values
-        times, cwnds = zip(*time_cwnd)
+        order = np.lexsort((cwnds, times))  # by time, then cwnd
+        times, cwnds = times[order], cwnds[order]
         # Plotting the graph
-        plt.figure(figsize=(10, 6))
-        plt.plot(times, cwnds, marker='o', linestyle='-', color='#254e8a', markersize=4)
-        plt.xlabel('Time (seconds)')
-        plt.ylabel('CWND (KBytes)')
-        plt.title(f'CWND vs Time')
-        plt.grid(True)
+        ax.clear()
+        ax.plot(times, cwnds, marker='o', linestyle='-', color='#254e8a', markersize=4)
+        ax.set_xlabel('Time (seconds)')
+        ax.set_ylabel('CWND (KBytes)')
+        ax.set_title('CWND vs Time')
+        ax.grid(True)
         # Save the graph
         output_file = os.path.join(output_dir, f'{os.path.basename(log_file)}.png')
-        plt.savefig(output_file)
-        plt.close()
\ No newline at end of file
+        canvas.print_png(output_file)
\ No newline at end of file
@@ -1,78 +1,140 @@
 #!/usr/bin/env python3
+import argparse
 import subprocess
 import csv
-from collections import defaultdict
+import importlib.util
+import io
+import logging
+from contextlib import contextmanager
 import matplotlib.pyplot as plt
 
-DEBUG = True  # Set to True for debug output
+try:
+    import pandas as pd
+except ImportError:
+    pd = None  # Fall back to the row-by-row parser
 
-def parse_flags(flags_str):
+log = logging.getLogger(__name__)
+
+# Column names for the fields extracted by tshark, and the ones identifying a connection
+FIELD_NAMES = ['t', 'sip', 'dip', 'sp', 'dp', 'flags']
+CONN_KEY = ['sip', 'dip', 'sp', 'dp']
+
+# Above this many connections the durations are binned with hexbin instead of drawn as points
+HEXBIN_THRESHOLD = 100000
+
+# SYN, FIN and RST: the flags of packets that start or end a connection
+TERMINATION_FLAGS = 0x02 | 0x01 | 0x04
+
+# Flag names for each of the 256 possible values of the low TCP flags byte
+FLAG_TABLE = [
+    frozenset(name for mask, name in [(0x02, 'SYN'), (0x10, 'ACK'), (0x01, 'FIN'), (0x04, 'RST')] if i & mask)
+    for i in range(256)
+]
+
+def flags_to_int(flags_str):
     """
-    Parse the TCP flags from a string.
+    Convert a TCP flags string to an int.
     Using int(flags_str, 0) allows auto-detection of hex (e.g., "0x0010").
-    Returns a set of flag names.
+    Unparseable values give 0 (no flags).
     """
     try:
-        flags_int = int(flags_str, 0)
+        return int(flags_str, 0)
     except ValueError:
-        return set()
-    flag_set = set()
-    if flags_int & 0x02:
-        flag_set.add('SYN')
-    if flags_int & 0x10:
-        flag_set.add('ACK')
-    if flags_int & 0x01:
-        flag_set.add('FIN')
-    if flags_int & 0x04:
-        flag_set.add('RST')
-    return flag_set
-
-def process_tcp_fields(filename):
+        return 0
+
+def parse_flags(flags_str):
+    """
+    Parse the TCP flags from a string.
+    Returns a frozenset of flag names, looked up in FLAG_TABLE.
+    """
+    return FLAG_TABLE[flags_to_int(flags_str) & 0xff]
+
+def process_tcp_fields(stream):
+    """
+    Compute (start time, duration) for every connection in the tshark output stream.
+    Start is the first packet seen; end is the first RST or FIN-ACK packet.
+    """
+    if pd is None:
+        return process_tcp_rows(csv.reader(io.TextIOWrapper(stream, 'ascii', newline='')))
+
+    df = pd.read_csv(stream, names=FIELD_NAMES, dtype=str)
+    # Short rows and rows with an empty key or flags field are skipped, as in process_tcp_rows
+    df = df.dropna(subset=CONN_KEY + ['flags'])
+    df['t'] = pd.to_numeric(df['t'], errors='coerce')
+    df = df.dropna(subset=['t'])
+    df['flags'] = df['flags'].map(flags_to_int).astype(int)
+    return connection_durations(df)
+
+def process_tcp_packets(packets):
+    """
+    Same as process_tcp_fields, for (time, src_ip, dst_ip, src_port, dst_port, flags)
+    tuples such as those yielded by read_tcp_packets.
+    """
+    if pd is None:
+        return process_tcp_rows([str(field) for field in packet] for packet in packets)
+    return connection_durations(pd.DataFrame.from_records(packets, columns=FIELD_NAMES))
+
+def connection_durations(df):
+    """
+    Vectorized core of process_tcp_fields: df has FIELD_NAMES columns with float
+    times and int flags. Returns a list of (start time, duration).
+    """
+    rst = (df['flags'] & 0x04).astype(bool)
+    fin = (df['flags'] & 0x01).astype(bool)
+    ack = (df['flags'] & 0x10).astype(bool)
+
+    start = df.groupby(CONN_KEY)['t'].min()
+    end = df[rst | (fin & ack)].groupby(CONN_KEY)['t'].min()
+    # If no termination is detected, assign a default duration of 100 seconds.
+    end = end.reindex(start.index).fillna(start + 100)
+
+    return list(zip(start.tolist(), (end - start).tolist()))
+
+def process_tcp_rows(rows):
     # Dictionary to store connection data: key = (src_ip, dst_ip, src_port, dst_port)
     # Value is a dict with keys 'start' and optionally 'end'
-    connections = defaultdict(dict)
+    connections = {}
+    # Checked once so disabled debug logging costs nothing per row
+    debug = log.isEnabledFor(logging.DEBUG)
     
-    with open(filename, 'r') as f:
-        reader = csv.reader(f, delimiter=',')
-        # If you added a header, uncomment the next line:
-        # next(reader, None)
-        for row in reader:
-            if DEBUG:
-                print("DEBUG: row =", row)
-            if len(row) < 6:
-                if DEBUG:
-                    print("DEBUG: Skipping row with insufficient fields:", row)
-                continue
-            time_epoch, src_ip, dst_ip, src_port, dst_port, flags_str = row
-            flags = parse_flags(flags_str)
-            if DEBUG:
-                print("DEBUG: Parsed flags from", flags_str, "->", flags)
-            conn_id = (src_ip, dst_ip, src_port, dst_port)
-            try:
-                time_epoch = float(time_epoch)
-            except ValueError:
-                if DEBUG:
-                    print("DEBUG: Invalid time value:", time_epoch)
-                continue
+    for row in rows:
+        if debug:
+            log.debug("row = %s", row)
+        if len(row) < 6 or not all(row[1:6]):
+            if debug:
+                log.debug("Skipping row with insufficient fields: %s", row)
+            continue
+        time_epoch, src_ip, dst_ip, src_port, dst_port, flags_str = row
+        flags = parse_flags(flags_str)
+        if debug:
+            log.debug("Parsed flags from %s -> %s", flags_str, flags)
+        conn_id = (src_ip, dst_ip, src_port, dst_port)
+        try:
+            time_epoch = float(time_epoch)
+        except ValueError:
+            if debug:
+                log.debug("Invalid time value: %s", time_epoch)
+            continue
 
-            # If this connection has not been seen before, record the first packet as start.
-            if conn_id not in connections:
-                connections[conn_id]['start'] = time_epoch
-                if DEBUG:
-                    print(f"DEBUG: Recorded start for {conn_id} at {time_epoch}")
-            
-            # Record termination events:
-            # If a RST packet is seen and no end has been recorded, mark as end.
-            if 'RST' in flags and 'end' not in connections[conn_id]:
-                connections[conn_id]['end'] = time_epoch
-                if DEBUG:
-                    print(f"DEBUG: Recorded RST end for {conn_id} at {time_epoch}")
-            
-            # If both FIN and ACK are present, mark as termination.
-            if 'FIN' in flags and 'ACK' in flags and 'end' not in connections[conn_id]:
-                connections[conn_id]['end'] = time_epoch
-                if DEBUG:
-                    print(f"DEBUG: Recorded FIN-ACK end for {conn_id} at {time_epoch}")
+        # If this connection has not been seen before, record the first packet as start.
+        entry = connections.get(conn_id)
+        if entry is None:
+            entry = connections[conn_id] = {'start': time_epoch}
+            if debug:
+                log.debug("Recorded start for %s at %s", conn_id, time_epoch)
+        
+        # Record termination events:
+        # If a RST packet is seen and no end has been recorded, mark as end.
+        if 'RST' in flags and 'end' not in entry:
+            entry['end'] = time_epoch
+            if debug:
+                log.debug("Recorded RST end for %s at %s", conn_id, time_epoch)
+        
+        # If both FIN and ACK are present, mark as termination.
+        if 'FIN' in flags and 'ACK' in flags and 'end' not in entry:
+            entry['end'] = time_epoch
+            if debug:
+                log.debug("Recorded FIN-ACK end for %s at %s", conn_id, time_epoch)
     
     connection_data = []
     for conn_id, times in connections.items():
@@ -94,36 +156,81 @@ def plot_connection_durations(connection_data):
     connection_data.sort(key=lambda x: x[0])
     start_times, durations = zip(*connection_data)
 
-    plt.figure(figsize=(10,6))
-    plt.scatter(start_times, durations, c='blue', label='Connection Duration')
-    plt.xlabel('Connection Start Time (epoch seconds)')
-    plt.ylabel('Connection Duration (seconds)')
-    plt.title('Connection Duration vs. Connection Start Time')
+    fig, ax = plt.subplots(figsize=(10,6))
+    if len(start_times) > HEXBIN_THRESHOLD:
+        ax.hexbin(start_times, durations, gridsize=100, mincnt=1, label='Connection Duration')
+    else:
+        # A single marker-only Line2D draws far faster than a scatter PathCollection
+        ax.plot(start_times, durations, linestyle='None', marker='.', markersize=2, color='blue',
+                rasterized=True, label='Connection Duration')
+    ax.set_xlabel('Connection Start Time (epoch seconds)')
+    ax.set_ylabel('Connection Duration (seconds)')
+    ax.set_title('Connection Duration vs. Connection Start Time')
     
     # Mark attack start and end (assuming experiment_start is the first recorded time)
     experiment_start = start_times[0]
-    plt.axvline(x=experiment_start + 20, color='red', linestyle='--', label='Attack Start')
-    plt.axvline(x=experiment_start + 120, color='green', linestyle='--', label='Attack End')
+    ax.axvline(x=experiment_start + 20, color='red', linestyle='--', label='Attack Start')
+    ax.axvline(x=experiment_start + 120, color='green', linestyle='--', label='Attack End')
     
-    plt.legend()
+    ax.legend()
     plt.show()
 
-def extract_tcp_fields(pcap_file, csv_file):
-    # Use tshark to extract TCP fields from the PCAP file
+@contextmanager
+def extract_tcp_fields(pcap_file):
+    """
+    Run tshark on the PCAP file and yield its stdout, which carries the TCP fields
+    of each packet as CSV. Only SYN, FIN and RST packets are kept, since those are
+    the only ones that start or end a connection.
+    """
     command = [
         'tshark', '-r', pcap_file, '-T', 'fields', '-e', 'frame.time_epoch',
         '-e', 'ip.src', '-e', 'ip.dst', '-e', 'tcp.srcport', '-e', 'tcp.dstport', '-e', 'tcp.flags',
-        '-E', 'header=y', '-E', 'separator=,', '-E', 'quote=d', '-E', 'occurrence=f'
+        '-Y', 'tcp.flags.syn==1 or tcp.flags.fin==1 or tcp.flags.reset==1',
+        '-E', 'header=n', '-E', 'separator=,', '-E', 'quote=d', '-E', 'occurrence=f'
     ]
-    with open(csv_file, 'w') as f:
-        subprocess.run(command, stdout=f)
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=1 << 20)
+    try:
+        yield proc.stdout
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+def read_tcp_packets(pcap_file):
+    """
+    Read the PCAP file in-process with scapy and yield
+    (time, src_ip, dst_ip, src_port, dst_port, flags) for each IPv4 TCP packet
+    carrying SYN, FIN or RST, mirroring what extract_tcp_fields gets from tshark.
+    scapy is imported here so the default tshark path does not pay for loading it.
+    """
+    from scapy.utils import PcapReader
+    from scapy.layers.inet import IP, TCP
+
+    with PcapReader(pcap_file) as reader:
+        for pkt in reader:
+            if IP not in pkt or TCP not in pkt:
+                continue
+            tcp = pkt[TCP]
+            flags = int(tcp.flags)
+            if flags & TERMINATION_FLAGS:
+                ip = pkt[IP]
+                yield float(pkt.time), ip.src, ip.dst, tcp.sport, tcp.dport, flags
 
 if __name__ == '__main__':
-    pcap_file = 'attack.pcap'
-    csv_file = 'tcp_fields.csv'
-    
-    extract_tcp_fields(pcap_file, csv_file)
+    parser = argparse.ArgumentParser(description="Plot TCP connection durations from a PCAP file")
+    parser.add_argument("pcap_file", nargs='?', default='attack.pcap', help="PCAP file to process")
+    parser.add_argument("--scapy", action="store_true",
+                        help="Read the PCAP in-process with scapy instead of piping it through tshark")
+    args = parser.parse_args()
+
+    # Log to a file rather than stdout; set level=logging.DEBUG for debug output
+    logging.basicConfig(filename='process_pcap.log', level=logging.WARNING)
     
-    connection_data = process_tcp_fields(csv_file)
+    if args.scapy:
+        if importlib.util.find_spec('scapy') is None:
+            parser.error("--scapy requires scapy to be installed")
+        connection_data = process_tcp_packets(read_tcp_packets(args.pcap_file))
+    else:
+        with extract_tcp_fields(args.pcap_file) as fields:
+            connection_data = process_tcp_fields(fields)
     print("Processed {} connections.".format(len(connection_data)))
     plot_connection_durations(connection_data)
\ No newline at end of file
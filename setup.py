@@ -36,9 +36,14 @@ Usage examples:
   sudo python3 setup.py --option b --cc cubic
   sudo python3 setup.py --option c --cc cubic --scenario 2a --loss 0
   sudo python3 setup.py --option d --cc cubic --scenario 2a --loss 1
+
+Experiment progress is logged to /tmp/setup.log; errors and the final
+"check the log files" instructions are also shown on the terminal.
 """
 
 import argparse
+import logging
+import subprocess
 import time
 from mininet.topo import Topo
 from mininet.net import Mininet
@@ -50,6 +55,10 @@ from mininet.link import TCLink
 # Base port number for iperf3 tests
 BASE_PORT = 8080
 
+log = logging.getLogger("exp")
+# Messages meant for the operator (where to find results); also shown on the terminal
+operator_log = logging.getLogger("exp.operator")
+
 class MyTopo(Topo):
     def __init__(self, bw_config=False, loss_param=0, **opts):
         """
@@ -102,6 +111,31 @@ class MyTopo(Topo):
 # Allow loading via "sudo mn --custom setup.py --topo mytopo"
 topos = { 'mytopo': (lambda: MyTopo()) }
 
+def start_iperf_servers(host, count):
+    """
+    Start `count` daemonized iperf3 servers on host, on ports BASE_PORT onwards.
+    All servers are launched from a single cmd() call to avoid one shell round-trip each.
+    """
+    host.cmd(" ; ".join("iperf3 -s -p {} -D".format(BASE_PORT + i) for i in range(count)))
+
+def launch_iperf_client(host, server_ip, port, duration, cc_scheme):
+    """
+    Start an iperf3 client on host without waiting for the node's shell, logging to
+    /tmp/iperf_<host>.log. Returns the Popen object.
+    """
+    with open("/tmp/iperf_{}.log".format(host.name), "w") as log_file:
+        return host.popen(["iperf3", "-c", server_ip, "-p", str(port), "-b", "10M", "-P", "10",
+                           "-t", str(duration), "-C", cc_scheme],
+                          stdout=log_file, stderr=subprocess.STDOUT)
+
+def sleep_until(deadline):
+    """
+    Sleep until the given time.monotonic() deadline, so waits do not accumulate drift.
+    """
+    delay = deadline - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
 def experiment_a(net, cc_scheme, link_loss):
     """
     Experiment (a): Single flow from h1 to h7.
@@ -111,24 +145,24 @@ def experiment_a(net, cc_scheme, link_loss):
     serverIP = h7.IP()
 
     if link_loss > 0:
-        print("Applying {}% packet loss on h1-eth0".format(link_loss))
+        log.info("Applying %s%% packet loss on h1-eth0", link_loss)
         h1.cmd("tc qdisc add dev h1-eth0 root netem loss {}%".format(link_loss))
     
-    print("Starting iperf3 server on h7 (port {})...".format(BASE_PORT))
-    h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT))
-    time.sleep(2)
+    log.info("Starting iperf3 server on h7 (port %s)...", BASE_PORT)
+    start_iperf_servers(h7, 1)
+    time.sleep(0.2)
     
     input("Press Enter to start the iperf3 client on h1...")
 
     cmd = ("iperf3 -c {} -p {} -b 10M -P 10 -t 150 -C {} "
            "> /tmp/iperf_h1.log 2>&1 &").format(serverIP, BASE_PORT, cc_scheme)
-    print("Starting iperf3 client on h1 with scheme '{}' on port {}".format(cc_scheme, BASE_PORT))
+    log.info("Starting iperf3 client on h1 with scheme '%s' on port %s", cc_scheme, BASE_PORT)
     h1.cmd(cmd)
     time.sleep(155)
     
     if link_loss > 0:
         h1.cmd("tc qdisc del dev h1-eth0 root netem")
-    print("Experiment (a) completed. Check /tmp/iperf_h1.log for results.")
+    operator_log.info("Experiment (a) completed. Check /tmp/iperf_h1.log for results.")
 
 def experiment_b(net, cc_scheme):
     """
@@ -143,249 +177,85 @@ def experiment_b(net, cc_scheme):
     h7 = net.get('h7')
     serverIP = h7.IP()
 
-    print("Starting iperf3 servers on h7 on ports {} to {}...".format(BASE_PORT, BASE_PORT+2))
-    h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT))
-    h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT+1))
-    h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT+2))
-    time.sleep(2)
+    log.info("Starting iperf3 servers on h7 on ports %s to %s...", BASE_PORT, BASE_PORT+2)
+    start_iperf_servers(h7, 3)
+    time.sleep(0.2)
     
     input("Press Enter to start the iperf3 clients on h1, h3, and h4...")
 
+    # Start times are measured from a single monotonic reference.
+    t0 = time.monotonic()
+
     # h1 starts at T=0 sec, duration 150 sec on port BASE_PORT.
-    cmd1 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 150 -C {} "
-            "> /tmp/iperf_h1.log 2>&1 &").format(serverIP, BASE_PORT, cc_scheme)
-    print("Starting iperf3 client on h1 with '{}' on port {}".format(cc_scheme, BASE_PORT))
-    h1.cmd(cmd1)
-    time.sleep(15)
+    log.info("Starting iperf3 client on h1 with '%s' on port %s", cc_scheme, BASE_PORT)
+    launch_iperf_client(h1, serverIP, BASE_PORT, 150, cc_scheme)
+    sleep_until(t0 + 15)
 
     # h3 starts at T=15 sec, duration 120 sec on port BASE_PORT+1.
-    cmd3 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 120 -C {} "
-            "> /tmp/iperf_h3.log 2>&1 &").format(serverIP, BASE_PORT+1, cc_scheme)
-    print("Starting iperf3 client on h3 with '{}' on port {}".format(cc_scheme, BASE_PORT+1))
-    h3.cmd(cmd3)
-    time.sleep(15)
+    log.info("Starting iperf3 client on h3 with '%s' on port %s", cc_scheme, BASE_PORT+1)
+    launch_iperf_client(h3, serverIP, BASE_PORT+1, 120, cc_scheme)
+    sleep_until(t0 + 30)
 
     # h4 starts at T=30 sec, duration 90 sec on port BASE_PORT+2.
-    cmd4 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 90 -C {} "
-            "> /tmp/iperf_h4.log 2>&1 &").format(serverIP, BASE_PORT+2, cc_scheme)
-    print("Starting iperf3 client on h4 with '{}' on port {}".format(cc_scheme, BASE_PORT+2))
-    h4.cmd(cmd4)
-    time.sleep(150)
-
-    print("Experiment (b) completed. Check /tmp/iperf_h1.log, /tmp/iperf_h3.log, and /tmp/iperf_h4.log.")
-
-def experiment_c(scenario, net, cc_scheme):
+    log.info("Starting iperf3 client on h4 with '%s' on port %s", cc_scheme, BASE_PORT+2)
+    launch_iperf_client(h4, serverIP, BASE_PORT+2, 90, cc_scheme)
+    sleep_until(t0 + 180)
+
+    operator_log.info("Experiment (b) completed. Check /tmp/iperf_h1.log, /tmp/iperf_h3.log, and /tmp/iperf_h4.log.")
+
+# Experiments (c) and (d): scenario -> (client hosts, switches joined by the extra direct link).
+# Client i talks to the iperf3 server on port BASE_PORT+i.
+SCENARIOS = {
+    '1': (['h3'], ('s2', 's4')),
+    '2a': (['h1', 'h2'], ('s1', 's4')),
+    '2b': (['h1', 'h3'], ('s1', 's4')),
+    '2c': (['h1', 'h3', 'h4'], ('s1', 's4')),
+}
+
+def experiment_cd(option, scenario, net, cc_scheme):
     """
-    Experiment (c): Bandwidth configuration experiments without link loss.
+    Experiments (c) and (d): Bandwidth configuration experiments. Experiment (d) only
+    differs in its topology, where the link between s2 and s3 is configured with loss.
     
-    Scenarios (choose via --scenario):
+    Scenarios (choose via --scenario, see SCENARIOS):
       - "1": Add direct link between s2 and s4; run client on h3.
       - "2a": Add direct link between s1 and s4; run clients on h1 and h2.
       - "2b": Add direct link between s1 and s4; run clients on h1 and h3.
       - "2c": Add direct link between s1 and s4; run clients on h1, h3 and h4.
     """
-    print("Experiment (c), scenario '{}'".format(scenario))
+    clients, (sw_a, sw_b) = SCENARIOS[scenario]
+    log.info("Experiment (%s), scenario '%s'", option, scenario)
+
+    hosts = [net.get(name) for name in clients]
     h7 = net.get('h7')
     serverIP = h7.IP()
 
-    # Start iperf3 server(s) on h7 based on scenario.
-    if scenario == '1':
-        print("Starting iperf3 server on h7 (port {})...".format(BASE_PORT))
-        h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT))
-    elif scenario in ['2a', '2b']:
-        print("Starting iperf3 servers on h7 on ports {} and {}...".format(BASE_PORT, BASE_PORT+1))
-        h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT))
-        h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT+1))
-    elif scenario == '2c':
-        print("Starting iperf3 servers on h7 on ports {} to {}...".format(BASE_PORT, BASE_PORT+2))
-        h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT))
-        h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT+1))
-        h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT+2))
-    else:
-        print("Invalid scenario for experiment (c).")
-        return
+    log.info("Starting iperf3 servers on h7 on ports %s to %s...", BASE_PORT, BASE_PORT+len(clients)-1)
+    start_iperf_servers(h7, len(clients))
+    time.sleep(0.2)
 
-    time.sleep(2)
-    
-    if scenario == '1':
-        s2 = net.get('s2')
-        s4 = net.get('s4')
-        print("Scenario 1: Adding direct link between s2 and s4 (bw=100Mbps).")
-        net.addLink(s2, s4, bw=100)
-        h3 = net.get('h3')
-
-        input("Press Enter to start the iperf3 client on h3...")
-
-        cmd = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-               "> /tmp/iperf_h3.log 2>&1 &").format(serverIP, BASE_PORT, cc_scheme)
-        print("Starting iperf3 client on h3 with '{}' on port {}".format(cc_scheme, BASE_PORT))
-        h3.cmd(cmd)
-        time.sleep(35)
-    
-    elif scenario == '2a':
-        s1 = net.get('s1')
-        s4 = net.get('s4')
-        print("Scenario 2a: Adding direct link between s1 and s4 (bw=100Mbps).")
-        net.addLink(s1, s4, bw=100)
-        h1 = net.get('h1')
-        h2 = net.get('h2')
-
-        input("Press Enter to start the iperf3 clients on h1 and h2...")
-
-        cmd1 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-                "> /tmp/iperf_h1.log 2>&1 &").format(serverIP, BASE_PORT, cc_scheme)
-        cmd2 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-                "> /tmp/iperf_h2.log 2>&1 &").format(serverIP, BASE_PORT+1, cc_scheme)
-        print("Starting iperf3 clients on h1 (port {}) and h2 (port {}) with '{}'".format(BASE_PORT, BASE_PORT+1, cc_scheme))
-        h1.cmd(cmd1)
-        h2.cmd(cmd2)
-    
-    elif scenario == '2b':
-        s1 = net.get('s1')
-        s4 = net.get('s4')
-        print("Scenario 2b: Adding direct link between s1 and s4 (bw=100Mbps).")
-        net.addLink(s1, s4, bw=100)
-        h1 = net.get('h1')
-        h3 = net.get('h3')
-
-        input("Press Enter to start the iperf3 clients on h1 and h3...")
-
-        cmd1 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-                "> /tmp/iperf_h1.log 2>&1 &").format(serverIP, BASE_PORT, cc_scheme)
-        cmd3 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-                "> /tmp/iperf_h3.log 2>&1 &").format(serverIP, BASE_PORT+1, cc_scheme)
-        print("Starting iperf3 clients on h1 (port {}) and h3 (port {}) with '{}'".format(BASE_PORT, BASE_PORT+1, cc_scheme))
-        h1.cmd(cmd1)
-        h3.cmd(cmd3)
-    
-    elif scenario == '2c':
-        s1 = net.get('s1')
-        s4 = net.get('s4')
-        print("Scenario 2c: Adding direct link between s1 and s4 (bw=100Mbps).")
-        net.addLink(s1, s4, bw=100)
-        h1 = net.get('h1')
-        h3 = net.get('h3')
-        h4 = net.get('h4')
-
-        input("Press Enter to start the iperf3 clients on h1, h3, and h4...")
-
-        cmd1 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-                "> /tmp/iperf_h1.log 2>&1 &").format(serverIP, BASE_PORT, cc_scheme)
-        cmd3 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-                "> /tmp/iperf_h3.log 2>&1 &").format(serverIP, BASE_PORT+1, cc_scheme)
-        cmd4 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-                "> /tmp/iperf_h4.log 2>&1 &").format(serverIP, BASE_PORT+2, cc_scheme)
-        print("Starting iperf3 clients on h1 (port {}), h3 (port {}), and h4 (port {}) with '{}'".format(BASE_PORT, BASE_PORT+1, BASE_PORT+2, cc_scheme))
-        h1.cmd(cmd1)
-        h3.cmd(cmd3)
-        h4.cmd(cmd4)
-    time.sleep(35)
-    print("Experiment (c) completed. Check the corresponding log files for results.")
-
-def experiment_d(scenario, net, cc_scheme):
-    """
-    Experiment (d): Same as experiment (c) but with the link between s2 and s3 configured with loss.
-    """
-    print("Experiment (d), scenario '{}' with link loss on s2-s3".format(scenario))
-    h7 = net.get('h7')
-    serverIP = h7.IP()
+    log.info("Scenario %s: Adding direct link between %s and %s (bw=100Mbps).", scenario, sw_a, sw_b)
+    net.addLink(net.get(sw_a), net.get(sw_b), bw=100)
 
-    # Start iperf3 server(s) on h7 based on scenario.
-    if scenario == '1':
-        print("Starting iperf3 server on h7 (port {})...".format(BASE_PORT))
-        h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT))
-    elif scenario in ['2a', '2b']:
-        print("Starting iperf3 servers on h7 on ports {} and {}...".format(BASE_PORT, BASE_PORT+1))
-        h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT))
-        h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT+1))
-    elif scenario == '2c':
-        print("Starting iperf3 servers on h7 on ports {} to {}...".format(BASE_PORT, BASE_PORT+2))
-        h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT))
-        h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT+1))
-        h7.cmd("iperf3 -s -p {} -D".format(BASE_PORT+2))
-    else:
-        print("Invalid scenario for experiment (d).")
-        return
+    input("Press Enter to start the iperf3 clients on {}...".format(", ".join(clients)))
 
-    time.sleep(2)
-    
-    if scenario == '1':
-        s2 = net.get('s2')
-        s4 = net.get('s4')
-        print("Scenario 1: Adding direct link between s2 and s4 (bw=100Mbps).")
-        net.addLink(s2, s4, bw=100)
-        h3 = net.get('h3')
-
-        input("Press Enter to start the iperf3 client on h3...")
-
-        cmd = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-               "> /tmp/iperf_h3.log 2>&1 &").format(serverIP, BASE_PORT, cc_scheme)
-        print("Starting iperf3 client on h3 with '{}' on port {}".format(cc_scheme, BASE_PORT))
-        h3.cmd(cmd)
-        time.sleep(35)
-    
-    elif scenario == '2a':
-        s1 = net.get('s1')
-        s4 = net.get('s4')
-        print("Scenario 2a: Adding direct link between s1 and s4 (bw=100Mbps).")
-        net.addLink(s1, s4, bw=100)
-        h1 = net.get('h1')
-        h2 = net.get('h2')
-
-        input("Press Enter to start the iperf3 clients on h1 and h2...")
-
-        cmd1 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-                "> /tmp/iperf_h1.log 2>&1 &").format(serverIP, BASE_PORT, cc_scheme)
-        cmd2 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-                "> /tmp/iperf_h2.log 2>&1 &").format(serverIP, BASE_PORT+1, cc_scheme)
-        print("Starting iperf3 clients on h1 (port {}) and h2 (port {}) with '{}'".format(BASE_PORT, BASE_PORT+1, cc_scheme))
-        h1.cmd(cmd1)
-        h2.cmd(cmd2)
-    
-    elif scenario == '2b':
-        s1 = net.get('s1')
-        s4 = net.get('s4')
-        print("Scenario 2b: Adding direct link between s1 and s4 (bw=100Mbps).")
-        net.addLink(s1, s4, bw=100)
-        h1 = net.get('h1')
-        h3 = net.get('h3')
-
-        input("Press Enter to start the iperf3 clients on h1 and h3...")
-
-        cmd1 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-                "> /tmp/iperf_h1.log 2>&1 &").format(serverIP, BASE_PORT, cc_scheme)
-        cmd3 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-                "> /tmp/iperf_h3.log 2>&1 &").format(serverIP, BASE_PORT+1, cc_scheme)
-        print("Starting iperf3 clients on h1 (port {}) and h3 (port {}) with '{}'".format(BASE_PORT, BASE_PORT+1, cc_scheme))
-        h1.cmd(cmd1)
-        h3.cmd(cmd3)
-    
-    elif scenario == '2c':
-        s1 = net.get('s1')
-        s4 = net.get('s4')
-        print("Scenario 2c: Adding direct link between s1 and s4 (bw=100Mbps).")
-        net.addLink(s1, s4, bw=100)
-        h1 = net.get('h1')
-        h3 = net.get('h3')
-        h4 = net.get('h4')
-
-        input("Press Enter to start the iperf3 clients on h1, h3, and h4...")
-
-        cmd1 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-                "> /tmp/iperf_h1.log 2>&1 &").format(serverIP, BASE_PORT, cc_scheme)
-        cmd3 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-                "> /tmp/iperf_h3.log 2>&1 &").format(serverIP, BASE_PORT+1, cc_scheme)
-        cmd4 = ("iperf3 -c {} -p {} -b 10M -P 10 -t 30 -C {} "
-                "> /tmp/iperf_h4.log 2>&1 &").format(serverIP, BASE_PORT+2, cc_scheme)
-        print("Starting iperf3 clients on h1 (port {}), h3 (port {}), and h4 (port {}) with '{}'".format(BASE_PORT, BASE_PORT+1, BASE_PORT+2, cc_scheme))
-        h1.cmd(cmd1)
-        h3.cmd(cmd3)
-        h4.cmd(cmd4)
-    time.sleep(35)
-    print("Experiment (d) completed. Check the corresponding log files for results.")
+    # All clients are started back to back, then waited on together.
+    procs = []
+    for i, host in enumerate(hosts):
+        log.info("Starting iperf3 client on %s with '%s' on port %s", host.name, cc_scheme, BASE_PORT+i)
+        procs.append(launch_iperf_client(host, serverIP, BASE_PORT+i, 30, cc_scheme))
+    for proc in procs:
+        proc.wait()
+    operator_log.info("Experiment (%s) completed. Check the corresponding log files for results.", option)
 
 if __name__ == '__main__':
     setLogLevel('info')
+    # Experiment progress goes to a file so it does not interleave with mininet's own output;
+    # warnings, errors and operator_log messages also go to the terminal.
+    console = logging.StreamHandler()
+    console.addFilter(lambda record: record.levelno >= logging.WARNING or record.name == operator_log.name)
+    logging.basicConfig(level=logging.INFO, handlers=[logging.FileHandler("/tmp/setup.log"), console],
+                        format="%(asctime)s %(levelname)s %(message)s")
     
     parser = argparse.ArgumentParser(description="Mininet TCP Congestion Control Experiment")
     parser.add_argument("--option", type=str, default="null",
@@ -397,6 +267,11 @@ if __name__ == '__main__':
     parser.add_argument("--scenario", type=str, default="",
                         help="For experiments c and d, specify scenario: 1, 2a, 2b, or 2c")
     args = parser.parse_args()
+
+    # Reject a bad scenario before the network is started
+    if args.option.lower() in ['c', 'd'] and args.scenario not in SCENARIOS:
+        parser.error("Invalid scenario for experiment ({}). Use --scenario {}.".format(
+            args.option.lower(), ", ".join(SCENARIOS)))
     
     if args.option.lower() == 'null':
         net = Mininet(topo=MyTopo(bw_config=False), controller=OVSController)
@@ -407,8 +282,7 @@ if __name__ == '__main__':
     elif args.option.lower() == 'd':
         net = Mininet(topo=MyTopo(bw_config=True, loss_param=args.loss), controller=OVSController, link=TCLink)
     else:
-        print("Invalid option specified. Use --option a, b, c, or d.")
-        exit(1)
+        parser.error("Invalid option specified. Use --option a, b, c, or d.")
     
     net.start()
     
@@ -418,10 +292,8 @@ if __name__ == '__main__':
         experiment_a(net, cc_scheme=args.cc, link_loss=args.loss)
     elif args.option.lower() == 'b':
         experiment_b(net, cc_scheme=args.cc)
-    elif args.option.lower() == 'c':
-        experiment_c(args.scenario, net, cc_scheme=args.cc)
-    elif args.option.lower() == 'd':
-        experiment_d(args.scenario, net, cc_scheme=args.cc)
+    elif args.option.lower() in ['c', 'd']:
+        experiment_cd(args.option.lower(), args.scenario, net, cc_scheme=args.cc)
     
     CLI(net)
     net.stop()